@@ -0,0 +1,46 @@
+# @name: contributors.py
+# @version: 0.1
+# @creation_date: 2026-10-19
+# @license: The MIT License <https://opensource.org/licenses/MIT>
+# @author: Simon Bowie <ad7588@coventry.ac.uk>
+# @purpose: Creates person items in Wikidata for the contributors to a Thoth work and maps contributions to Wikidata properties
+# @acknowledgements:
+# Wikidata definition of a work item: https://www.wikidata.org/wiki/Wikidata:WikiProject_Books#Work_item_properties
+
+import thoth
+import wikidata
+import json
+import re
+
+# a person is identified by their name and contribution type: the same as the label and description we give their entity,
+# which is what Wikidata uses to tell whether an entity already exists
+def get_person_key(contributor):
+    return contributor['fullName'] + '|' + contributor['contributionType']
+
+# get the property for a contribution: e.g. 'author' for an AUTHOR contribution if 'AUTHOR' is one of the contribution types given,
+# otherwise 'contributor'
+def get_contributor_property(contributor, property_values, contribution_types):
+    if contributor['contributionType'] in contribution_types:
+        return property_values[contributor['contributionType'].lower()]
+    return property_values['contributor']
+
+def create_person(api_url, CSRF_token, contributor):
+    parsed_person = thoth.parse_person(contributor)
+    # create entity for the person
+    person_id = wikidata.create_entity(api_url, CSRF_token, parsed_person)
+    # If there's already an entity object with that label and description, return the entity ID of that existing object
+    if person_id[2:7] == 'error':
+        data = json.loads(person_id)
+        entity_id_search = re.search("\[\[(Q.*)\|", data["error"]["info"])
+        if entity_id_search:
+            person_id = entity_id_search.group(1)
+    return person_id
+
+# create (or find) entities for all the contributors to a work and return a dictionary of person key: entity ID
+def create_people(api_url, CSRF_token, thoth_work):
+    person_ids = {}
+    for contributor in thoth_work['contributions']:
+        person_key = get_person_key(contributor)
+        if person_key not in person_ids:
+            person_ids[person_key] = create_person(api_url, CSRF_token, contributor)
+    return person_ids
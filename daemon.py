@@ -0,0 +1,251 @@
+# @name: daemon.py
+# @version: 0.1
+# @creation_date: 2026-10-19
+# @license: The MIT License <https://opensource.org/licenses/MIT>
+# @author: Simon Bowie <ad7588@coventry.ac.uk>
+# @purpose: Runs the Thoth to Wikidata integration as a long-running process with a warm Wikidata session and lookup caches
+# @acknowledgements:
+# Python http.server: https://docs.python.org/3/library/http.server.html
+#
+# The daemon does three things:
+# - every daemon_poll_interval seconds it asks Thoth for works updated since the last poll and writes them to Wikidata
+# - it accepts work IDs POSTed to http://<daemon_host>:<daemon_port>/works (a JSON list of IDs) and writes those works to Wikidata
+# - it reports health and throughput counters as JSON at http://<daemon_host>:<daemon_port>/status
+
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import thoth
+import wikidata
+import subjects
+import main
+
+# work IDs waiting to be written to Wikidata
+work_queue = queue.Queue()
+
+def now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+# counters reported on the status endpoint
+status_lock = threading.Lock()
+status = dict(
+    started_at=now(),
+    logins=0,
+    cache_clears=0,
+    polls=0,
+    poll_errors=0,
+    last_poll=None,
+    last_updated_at=None,
+    works_queued=0,
+    works_synced=0,
+    works_failed=0,
+    works_abandoned=0,
+    last_sync=None,
+    last_error=None
+)
+
+def get_daemon_config():
+    # get daemon settings from OS environment variables: set in env file passed through Docker Compose
+    daemon_config = dict(
+        poll_interval=int(os.environ.get('daemon_poll_interval') or 300),
+        host=os.environ.get('daemon_host') or '127.0.0.1',
+        port=int(os.environ.get('daemon_port') or 8000),
+        # seconds between emptying the Wikidata lookup caches so that entities deleted or merged on Wikidata are noticed
+        cache_ttl=int(os.environ.get('daemon_cache_ttl') or 3600),
+        # works that fail to be written are tried again after retry_delay seconds, then twice that, and so on, up to max_retries times
+        retry_delay=int(os.environ.get('daemon_retry_delay') or 60),
+        max_retries=int(os.environ.get('daemon_max_retries') or 3),
+        # only works updated in Thoth after this timestamp are picked up by polling. defaults to the time the daemon starts:
+        # run main.py to backfill older works
+        since=os.environ.get('daemon_since') or now()
+    )
+    return daemon_config
+
+def update_status(**kwargs):
+    with status_lock:
+        for key, value in kwargs.items():
+            status[key] = value
+
+def increment_status(key, amount=1):
+    with status_lock:
+        status[key] += amount
+
+def get_status():
+    with status_lock:
+        report = dict(status)
+    started_at = datetime.datetime.fromisoformat(report['started_at'])
+    uptime = (datetime.datetime.now(datetime.timezone.utc) - started_at).total_seconds()
+    report['uptime_seconds'] = int(uptime)
+    report['works_per_minute'] = round(report['works_synced'] / (uptime / 60), 2) if uptime > 0 else 0
+    report['queue_length'] = work_queue.qsize()
+    report['works_awaiting_retry'] = len(retry_due)
+    report['search_cache_size'] = len(wikidata.search_cache)
+    report['entity_cache_size'] = len(wikidata.entity_cache)
+    return report
+
+def login():
+    login_info = wikidata.authenticate()
+    increment_status('logins')
+    return login_info
+
+# write a work to Wikidata using the shared session. if Wikidata rejects a write because our session or CSRF token has expired
+# we log in again and retry once. any other error is raised so the work is counted as failed
+def sync_work(login_info, thoth_work, subject_ids):
+    try:
+        main.sync_work(login_info[0], login_info[1], thoth_work, subject_ids)
+    except wikidata.WikidataAPIError as e:
+        if e.code not in wikidata.session_error_codes:
+            raise
+        login_info = login()
+        main.sync_work(login_info[0], login_info[1], thoth_work, subject_ids)
+    return login_info
+
+# ask Thoth for works that have changed since the last poll. the cursor moves past all of them: any that then fail to be
+# written are retried by run_worker rather than by the next poll
+def poll_thoth():
+    with status_lock:
+        since = status['last_updated_at']
+    try:
+        updated_works = thoth.get_updated_thoth_works(since)
+    except thoth.MissingUpdatedAtError:
+        # without 'updatedAt' polling can never find a changed work, so stop rather than carry on polling for nothing
+        raise
+    except Exception as e:
+        increment_status('poll_errors')
+        update_status(last_error='Poll failed: ' + repr(e))
+        return []
+    if updated_works:
+        update_status(last_updated_at=updated_works[0]['updatedAt'])
+    increment_status('polls')
+    update_status(last_poll=now())
+    return updated_works
+
+# works that failed to be written and are waiting to be tried again, as dictionaries of workId: failed attempts so far and
+# workId: time (from time.monotonic) the next attempt is due. polling moves past failed works, so this is how they get written
+retry_attempts = {}
+retry_due = {}
+
+# schedule another attempt at a work that failed, waiting longer after each failure, until it's failed max_retries times
+def schedule_retry(work_id, retry_delay, max_retries):
+    attempts = retry_attempts.get(work_id, 0) + 1
+    retry_due.pop(work_id, None)
+    if attempts > max_retries:
+        retry_attempts.pop(work_id, None)
+        increment_status('works_abandoned')
+        update_status(last_error='Gave up on ' + work_id + ' after ' + str(max_retries) + ' retries')
+        return
+    retry_attempts[work_id] = attempts
+    retry_due[work_id] = time.monotonic() + retry_delay * attempts
+
+# get works from Thoth by workId. works that can't be retrieved are retried later
+def fetch_works(work_ids, retry_delay, max_retries):
+    fetched_works = []
+    for work_id in work_ids:
+        try:
+            fetched_works.append(thoth.get_thoth_work(work_id))
+        except Exception as e:
+            increment_status('works_failed')
+            update_status(last_error='Could not retrieve ' + work_id + ' from Thoth: ' + repr(e))
+            schedule_retry(work_id, retry_delay, max_retries)
+    return fetched_works
+
+# worker loop: writes queued works as soon as they arrive, polls Thoth whenever the poll interval has elapsed, and retries
+# works that failed once their retry is due
+def run_worker(poll_interval, cache_ttl, retry_delay, max_retries):
+    login_info = login()
+    next_poll = time.monotonic()
+    next_cache_clear = time.monotonic() + cache_ttl
+    while True:
+        if time.monotonic() >= next_cache_clear:
+            wikidata.clear_caches()
+            increment_status('cache_clears')
+            next_cache_clear = time.monotonic() + cache_ttl
+
+        pending_works = []
+        due_work_ids = [work_id for work_id, due in retry_due.items() if due <= time.monotonic()]
+        if time.monotonic() >= next_poll:
+            pending_works = poll_thoth()
+            next_poll = time.monotonic() + poll_interval
+        elif due_work_ids:
+            for work_id in due_work_ids:
+                del retry_due[work_id]
+            pending_works = fetch_works(due_work_ids, retry_delay, max_retries)
+        else:
+            wake_up = min([next_poll, next_cache_clear] + list(retry_due.values()))
+            try:
+                work_id = work_queue.get(timeout=max(wake_up - time.monotonic(), 0))
+            except queue.Empty:
+                continue
+            pending_works = fetch_works([work_id], retry_delay, max_retries)
+
+        if not pending_works:
+            continue
+
+        # resolve the subjects of everything in this batch in one go
+        try:
+            subject_ids = subjects.resolve_subjects(login_info[0], pending_works)
+        except Exception as e:
+            subject_ids = {}
+            update_status(last_error='Could not resolve subjects: ' + repr(e))
+
+        for thoth_work in pending_works:
+            try:
+                login_info = sync_work(login_info, thoth_work, subject_ids)
+                retry_attempts.pop(thoth_work['workId'], None)
+                increment_status('works_synced')
+                update_status(last_sync=now())
+            except Exception as e:
+                increment_status('works_failed')
+                update_status(last_error='Could not sync ' + str(thoth_work['workId']) + ': ' + repr(e))
+                schedule_retry(thoth_work['workId'], retry_delay, max_retries)
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    def send_json(self, code, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/status':
+            self.send_json(200, get_status())
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    # accepts a JSON list of Thoth work IDs, e.g. ["e0f748b2-984f-45cc-8b9e-13989c31dda4"]
+    def do_POST(self):
+        if self.path != '/works':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            work_ids = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_json(400, {'error': 'Body must be a JSON list of work IDs'})
+            return
+        if not isinstance(work_ids, list) or not all(isinstance(work_id, str) for work_id in work_ids):
+            self.send_json(400, {'error': 'Body must be a JSON list of work IDs'})
+            return
+        for work_id in work_ids:
+            work_queue.put(work_id)
+        increment_status('works_queued', len(work_ids))
+        self.send_json(202, {'queued': work_ids})
+
+if __name__ == '__main__':
+    daemon_config = get_daemon_config()
+    update_status(last_updated_at=daemon_config['since'])
+
+    server = ThreadingHTTPServer((daemon_config['host'], daemon_config['port']), DaemonRequestHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    print('Listening on http://' + daemon_config['host'] + ':' + str(daemon_config['port']))
+
+    # the worker runs in the main thread so that a failure to log in to Wikidata stops the daemon
+    run_worker(daemon_config['poll_interval'], daemon_config['cache_ttl'], daemon_config['retry_delay'], daemon_config['max_retries'])
@@ -0,0 +1,196 @@
+# @name: exporter.py
+# @version: 0.1
+# @creation_date: 2026-10-19
+# @license: The MIT License <https://opensource.org/licenses/MIT>
+# @author: Simon Bowie <ad7588@coventry.ac.uk>
+# @purpose: Exports the Thoth catalogue as a Wikibase JSON entity dump for seeding a new Wikibase instance without the API
+# @acknowledgements:
+# Wikibase JSON data model: https://www.mediawiki.org/wiki/Wikibase/DataModel/JSON
+# Wikidata JSON dumps: https://www.wikidata.org/wiki/Wikidata:Database_download#JSON_dumps_(recommended)
+#
+# The dump is a JSON array with one item per line, like the Wikidata JSON dumps. It has an item for every work, every edition
+# with an ISBN, and every contributor, using the same labels, descriptions, and statements that main.py writes through the API.
+# Items are given local Q ids counting up from --first-id. The Q ids given out are written to a mapping file (--mapping) and reused
+# by later exports, so an item keeps its Q id as the catalogue grows. Works are keyed by workId, editions by ISBN, and people by
+# name and contribution type.
+# Properties are taken from the env file and must already exist in the target instance. The only Q ids from outside the dump
+# that statements may point to are the constant entities set in the env file (written_work, version, cc_by_license) and those
+# in a subject index for the target instance (--subject-index): these must already exist in the target instance too, and
+# local Q ids that collide with them are refused. Statements pointing anywhere else (e.g. cc_by_license left to its
+# wikidata.org default) are left out. Places of publication aren't searched for.
+# Every snak includes its property's datatype, from the defaults in wikidata.get_property_datatypes or <property>_datatype in the env file.
+# Run:
+# docker exec -it python python exporter.py --snapshot --first-id 1000
+
+import argparse
+import gzip
+import json
+import os
+
+import thoth
+import wikidata
+import snapshot
+import subjects
+import contributors
+import work
+import editions
+
+# hands out Q ids, reusing those in the mapping from previous exports. target_ids are the Q ids of entities that already
+# exist in the target instance: handing one of those out would make two different items share a Q id
+class EntityIds:
+    def __init__(self, mapping, first_id, target_ids):
+        self.mapping = mapping
+        self.target_ids = target_ids
+        for section in ['works', 'editions', 'people']:
+            self.mapping.setdefault(section, {})
+        self.local_ids = set(entity_id for section in self.mapping.values() for entity_id in section.values())
+        for entity_id in self.local_ids:
+            self.check_id(entity_id)
+        existing_ids = [int(entity_id[1:]) for entity_id in self.local_ids]
+        self.next_id = max(existing_ids + [first_id - 1]) + 1
+
+    def check_id(self, entity_id):
+        if entity_id in self.target_ids:
+            raise ValueError('Local Q id ' + entity_id + ' is already an entity in the target instance: choose a --first-id above ' + max_id(self.target_ids) + ' and start a new mapping file')
+
+    # returns the Q id for a key, giving out the next one if the key hasn't had one before
+    def get(self, section, key):
+        if key in self.mapping[section]:
+            return self.mapping[section][key]
+        entity_id = 'Q' + str(self.next_id)
+        self.check_id(entity_id)
+        self.next_id += 1
+        self.mapping[section][key] = entity_id
+        self.local_ids.add(entity_id)
+        return entity_id
+
+    # whether a statement may point to an entity: it must be one of ours or already exist in the target instance
+    def is_known(self, entity_id):
+        return entity_id in self.local_ids or entity_id in self.target_ids
+
+def max_id(entity_ids):
+    return max(entity_ids, key=lambda entity_id: int(entity_id[1:]))
+
+# the Q ids of entities that must already exist in the target instance: constants set in the env file and subjects in the index
+def get_target_ids(subject_index):
+    target_ids = set()
+    for name in wikidata.get_constant_entities():
+        if os.environ.get(name):
+            target_ids.add(os.environ.get(name))
+    for section in subject_index.values():
+        target_ids.update(section.values())
+    return target_ids
+
+# turn a (property, value type, value) statement into a Wikibase statement. like the Wikidata JSON dumps, every snak says
+# what datatype its property has (see wikidata.get_property_datatypes) so the dump can be read without looking properties up
+def build_statement(statement, property_datatypes):
+    prop, value_type, value = statement
+    if value_type == 'wikibase-entityid':
+        value = {'entity-type': 'item', 'numeric-id': int(value[1:]), 'id': value}
+    return {
+        'mainsnak': {
+            'snaktype': 'value',
+            'property': prop,
+            'datavalue': {'value': value, 'type': value_type},
+            'datatype': property_datatypes[prop]
+        },
+        'type': 'statement',
+        'rank': 'normal'
+    }
+
+# build a Wikibase item from a data string from one of the thoth.parse_* functions and a list of statements
+def build_entity(entity_id, data_string, statements, entity_ids, property_datatypes):
+    entity = json.loads(data_string)
+    claims = {}
+    for statement in statements:
+        # properties that aren't set in the env file are left out
+        if statement[0] is None or statement[2] is None:
+            continue
+        # as are statements pointing to entities that aren't in the dump or the target instance
+        if statement[1] == 'wikibase-entityid' and not entity_ids.is_known(statement[2]):
+            continue
+        claims.setdefault(statement[0], []).append(build_statement(statement, property_datatypes))
+    return {
+        'type': 'item',
+        'id': entity_id,
+        'labels': entity['labels'],
+        'descriptions': entity['descriptions'],
+        'aliases': {},
+        'claims': claims,
+        'sitelinks': {}
+    }
+
+# build all the items for a Thoth work: the work, its editions, and any contributors not already exported
+def build_work_entities(thoth_work, entity_ids, exported_people, subject_ids, property_datatypes):
+    entities = []
+
+    person_ids = {}
+    for contributor in thoth_work['contributions']:
+        person_key = contributors.get_person_key(contributor)
+        person_ids[person_key] = entity_ids.get('people', person_key)
+        if person_key not in exported_people:
+            exported_people.add(person_key)
+            entities.append(build_entity(person_ids[person_key], thoth.parse_person(contributor), [], entity_ids, property_datatypes))
+
+    work_id = entity_ids.get('works', thoth_work['workId'])
+    work_statements = work.get_work_statements(thoth_work, person_ids, subject_ids)
+    entities.append(build_entity(work_id, thoth.parse_thoth_work(thoth_work), work_statements, entity_ids, property_datatypes))
+
+    for publication in sorted(thoth_work['publications'], key=lambda publication: publication['isbn'] or ''):
+        if publication['isbn'] is not None:
+            edition_id = entity_ids.get('editions', publication['isbn'])
+            edition_statements = editions.get_edition_statements(thoth_work, work_id, publication, person_ids, None)
+            entities.append(build_entity(edition_id, thoth.parse_thoth_edition(thoth_work, publication), edition_statements, entity_ids, property_datatypes))
+
+    return entities
+
+def open_output(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+# write the dump one item at a time and return the number of items written
+def export_works(thoth_works, output_path, entity_ids, subject_ids):
+    exported_people = set()
+    property_datatypes = wikidata.get_property_datatypes()
+    count = 0
+    with open_output(output_path) as f:
+        f.write('[\n')
+        for thoth_work in sorted(thoth_works, key=lambda thoth_work: thoth_work['workId']):
+            for entity in build_work_entities(thoth_work, entity_ids, exported_people, subject_ids, property_datatypes):
+                if count > 0:
+                    f.write(',\n')
+                f.write(json.dumps(entity, sort_keys=True))
+                count += 1
+        f.write('\n]\n')
+    return count
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export Thoth works as a Wikibase JSON entity dump')
+    parser.add_argument('--output', default='wikibase_seed.json', help='dump file to write: compressed with gzip if it ends in .gz')
+    parser.add_argument('--mapping', default='wikibase_seed_qids.json', help='JSON file of the Q ids given to works, editions, and people')
+    parser.add_argument('--first-id', type=int, required=True, help='number of the first Q id to give out if the mapping file is empty: must be above every entity already in the target instance')
+    parser.add_argument('--subject-index', help='subject index file (see subjects.py) mapping subjects to entities in the target instance: without it no main subjects are exported')
+    parser.add_argument('--snapshot', action='store_true', help='read works from the local Thoth snapshot (see snapshot.py) instead of the Thoth API')
+    args = parser.parse_args()
+
+    if args.snapshot:
+        thoth_works = snapshot.get_snapshot_works()
+    else:
+        thoth_works = thoth.get_updated_thoth_works(None)
+
+    try:
+        with open(args.mapping, encoding='utf-8') as f:
+            mapping = json.load(f)
+    except FileNotFoundError:
+        mapping = {}
+    # subject Q ids from the live wiki's index or cache belong to a different instance so only an index for the target instance is used
+    subject_index = subjects.read_json_file(args.subject_index) if args.subject_index else {}
+    entity_ids = EntityIds(mapping, args.first_id, get_target_ids(subject_index))
+
+    count = export_works(thoth_works, args.output, entity_ids, subjects.resolve_indexed_subjects(thoth_works, subject_index))
+
+    with open(args.mapping, 'w', encoding='utf-8') as f:
+        json.dump(entity_ids.mapping, f, indent=2, sort_keys=True)
+
+    print('Exported ' + str(count) + ' items to ' + args.output + ' and their Q ids to ' + args.mapping)
@@ -10,24 +10,24 @@
 # Thoth API client: https://github.com/thoth-pub/thoth-client
 # How Wikidata models books: https://www.wikidata.org/wiki/Wikidata:WikiProject_Books
 
+import argparse
+import sys
 import thoth
+import snapshot
 import wikidata
 import work
 import editions
+import subjects
 
-thoth_works = thoth.get_thoth_works()
-
-for thoth_work in thoth_works:
-    login_info = wikidata.authenticate()
-    api_url = login_info[0]
-    CSRF_token = login_info[1]
-
+# write a single Thoth work and its editions to Wikidata
+# subject_ids is a dictionary of resolved subjects for the batch the work belongs to (see subjects.resolve_subjects)
+def sync_work(api_url, CSRF_token, thoth_work, subject_ids=None):
     # Books on Wikidata are modelled as works (the abstract written work comprising the text) and editions (a particular publication of a work)
     # First we create the work as an entity
     work_id = work.create_work(api_url, CSRF_token, thoth_work)
 
     # Then we write statements to that work entity to represent various metadata elements
-    work.write_work_statements(api_url, CSRF_token, thoth_work, work_id)
+    work.write_work_statements(api_url, CSRF_token, thoth_work, work_id, subject_ids)
 
     print('Work ID: ', work_id)
 
@@ -40,3 +40,39 @@ for thoth_work in thoth_works:
             editions.write_edition_statements(api_url, CSRF_token, thoth_work, work_id, edition_id, publication)
 
             print('Edition ID: ', edition_id)
+
+    return work_id
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write Thoth works to Wikidata')
+    parser.add_argument('--snapshot', action='store_true', help='read works from the local Thoth snapshot (see snapshot.py) instead of the Thoth API')
+    parser.add_argument('--refresh-snapshot', action='store_true', help='fetch works updated since the snapshot was taken into the snapshot before reading from it')
+    parser.add_argument('--limit', type=int, default=1, help='number of works to write, earliest published first, whether from the Thoth API or the snapshot')
+    args = parser.parse_args()
+
+    if args.refresh_snapshot:
+        snapshot.refresh_snapshot(snapshot.get_snapshot_path())
+    if args.snapshot or args.refresh_snapshot:
+        thoth_works = snapshot.get_snapshot_works(limit=args.limit)
+    else:
+        thoth_works = thoth.get_thoth_works(limit=args.limit)
+
+    # resolve the subjects of all the works in one go rather than work by work
+    subject_ids = subjects.resolve_subjects(wikidata.get_url(), thoth_works)
+
+    # a work that fails (e.g. Wikidata rejects a statement) is reported and skipped so the rest still get written
+    failed_works = []
+    for thoth_work in thoth_works:
+        login_info = wikidata.authenticate()
+        api_url = login_info[0]
+        CSRF_token = login_info[1]
+
+        try:
+            sync_work(api_url, CSRF_token, thoth_work, subject_ids)
+        except Exception as e:
+            print('Could not write work ' + thoth_work['workId'] + ': ' + repr(e), file=sys.stderr)
+            failed_works.append(thoth_work['workId'])
+
+    if failed_works:
+        print(str(len(failed_works)) + ' of ' + str(len(thoth_works)) + ' works could not be written', file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,82 @@
+# @name: snapshot.py
+# @version: 0.1
+# @creation_date: 2026-10-19
+# @license: The MIT License <https://opensource.org/licenses/MIT>
+# @author: Simon Bowie <ad7588@coventry.ac.uk>
+# @purpose: Keeps a local snapshot of Thoth works so that reruns don't have to fetch everything from the Thoth API again
+# @acknowledgements:
+# JSON Lines: https://jsonlines.org/
+#
+# The snapshot is a gzipped JSON Lines file: one Thoth work per line, sorted by workId so the same works always give the same file.
+# Refreshing the snapshot only fetches works whose 'updatedAt' is later than the latest 'updatedAt' already in the snapshot.
+# Works deleted from Thoth stay in the snapshot: delete the snapshot file to fetch everything afresh.
+# Run this script to create or refresh the snapshot:
+# docker exec -it python python snapshot.py
+
+import gzip
+import json
+import os
+
+import thoth
+
+def get_snapshot_path():
+    # get the snapshot file path from OS environment variables: set in env file passed through Docker Compose
+    return os.environ.get('thoth_snapshot_file') or 'thoth_works.jsonl.gz'
+
+# read the works in a snapshot into a dictionary of workId: work
+def read_snapshot(path):
+    works = {}
+    if not os.path.exists(path):
+        return works
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                work = json.loads(line)
+                works[work['workId']] = work
+    return works
+
+# write to a temporary file first so that an interrupted write doesn't leave a broken snapshot behind
+def write_snapshot(path, works):
+    temp_path = path + '.tmp'
+    with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+        for work_id in sorted(works):
+            f.write(json.dumps(works[work_id], sort_keys=True) + '\n')
+    os.replace(temp_path, path)
+
+# the latest 'updatedAt' in the snapshot, or None if the snapshot is empty. every work in the snapshot must have an 'updatedAt':
+# without one we can't tell what's changed, and quietly fetching the whole catalogue again would defeat the point of the snapshot
+def get_latest_updated_at(works):
+    if not works:
+        return None
+    missing = [work_id for work_id, work in works.items() if work.get('updatedAt') is None]
+    if missing:
+        raise thoth.MissingUpdatedAtError(str(len(missing)) + ' works in the snapshot have no updatedAt (e.g. ' + missing[0] + '): delete the snapshot file to fetch everything afresh')
+    latest_work = max(works.values(), key=lambda work: thoth.parse_timestamp(work['updatedAt']))
+    return latest_work['updatedAt']
+
+# fetch works from Thoth that are newer than the snapshot, add them to it, and return the number of works fetched
+def refresh_snapshot(path):
+    works = read_snapshot(path)
+    updated_works = thoth.get_updated_thoth_works(get_latest_updated_at(works))
+    for work in updated_works:
+        works[work['workId']] = work
+    if updated_works or not os.path.exists(path):
+        write_snapshot(path, works)
+    return len(updated_works)
+
+# get Thoth works from the snapshot as a list. with a limit, the works are chosen the same way as thoth.get_thoth_works chooses them
+# from the API: the earliest published first (works with no publication date last, and works published on the same day by workId)
+def get_snapshot_works(path=None, limit=None):
+    if path is None:
+        path = get_snapshot_path()
+    works = read_snapshot(path)
+    snapshot_works = [works[work_id] for work_id in sorted(works)]
+    if limit is not None:
+        snapshot_works.sort(key=lambda work: (work.get('publicationDate') is None, work.get('publicationDate') or ''))
+        snapshot_works = snapshot_works[:limit]
+    return snapshot_works
+
+if __name__ == '__main__':
+    path = get_snapshot_path()
+    fetched = refresh_snapshot(path)
+    print('Fetched ' + str(fetched) + ' updated works from Thoth into ' + path)
@@ -0,0 +1,144 @@
+# @name: subjects.py
+# @version: 0.1
+# @creation_date: 2026-10-19
+# @license: The MIT License <https://opensource.org/licenses/MIT>
+# @author: Simon Bowie <ad7588@coventry.ac.uk>
+# @purpose: Resolves Thoth subjects (subject codes and keywords) to Wikidata entity IDs for 'main subject' statements
+# @acknowledgements:
+# Wikidata wbgetentities API: https://www.wikidata.org/w/api.php?action=help&modules=wbgetentities
+#
+# Subjects are resolved for a whole batch of works at once so that a keyword shared by many works is only looked up once:
+# - BIC, BISAC, Thema, and LCC codes are mapped to entity IDs using the local index file (subject_index_file)
+# - keywords are mapped using the KEYWORD section of the index file, then the persistent cache (subject_cache_file),
+#   then in bulk against English Wikipedia page titles, and finally one entity search per keyword that's still unresolved.
+#   Either way, an entity is only accepted if its English label or one of its aliases is exactly the keyword and it isn't a
+#   disambiguation page (see disambiguation_page in the env file): anything else is left unresolved and can be added to the
+#   KEYWORD section of the index by hand
+# Every keyword looked up is written to the cache, including those with no match, so it's never looked up again.
+# Delete the cache file to look everything up afresh.
+
+import json
+import os
+
+import wikidata
+
+def get_subject_files():
+    # get the subject index and cache file paths from OS environment variables: set in env file passed through Docker Compose
+    subject_files = dict(
+        index=os.environ.get('subject_index_file') or 'subject_index.json',
+        cache=os.environ.get('subject_cache_file') or 'subject_cache.json'
+    )
+    return subject_files
+
+def read_json_file(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+# the index file looks like this, with a section per subject type mapping codes (or lowercase keywords) to entity IDs:
+# {"BIC": {"JFD": "Q...."}, "THEMA": {"JBCT": "Q...."}, "LCC": {"HM": "Q...."}, "KEYWORD": {"open access": "Q...."}}
+# entity IDs differ between test.wikidata.org and wikidata.org so use a different index file for each
+def read_index():
+    return read_json_file(get_subject_files()['index'])
+
+# the cache file is keyed by API URL so that test.wikidata.org and wikidata.org results don't get mixed up
+def read_cache(api_url):
+    cache = read_json_file(get_subject_files()['cache'])
+    return cache.get(api_url, {})
+
+def write_cache(api_url, keyword_cache):
+    path = get_subject_files()['cache']
+    cache = read_json_file(path)
+    cache[api_url] = keyword_cache
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+def normalise_keyword(keyword):
+    return ' '.join(keyword.split()).lower()
+
+# the subjects we write 'main subject' statements for: every coded subject plus every keyword
+def get_work_subjects(thoth_work):
+    work_subjects = []
+    for subject in thoth_work['subjects']:
+        if subject['subjectType'] == 'KEYWORD':
+            subject_code = normalise_keyword(subject['subjectCode'] or '')
+        else:
+            subject_code = (subject['subjectCode'] or '').strip()
+        # blank subjects can't be resolved to anything
+        if subject_code:
+            work_subjects.append((subject['subjectType'], subject_code))
+    return work_subjects
+
+# collect the distinct subjects across a batch of works
+def collect_subjects(thoth_works):
+    distinct_subjects = set()
+    for thoth_work in thoth_works:
+        distinct_subjects.update(get_work_subjects(thoth_work))
+    return distinct_subjects
+
+# characters MediaWiki doesn't allow in page titles
+invalid_title_characters = '#<>[]|{}'
+
+# look up keywords that aren't in the index or cache and add what we find to the cache
+def resolve_keywords(api_url, keywords, keyword_cache):
+    unresolved = sorted(keyword for keyword in keywords if keyword not in keyword_cache)
+    if not unresolved:
+        return
+
+    # first try all the keywords in bulk as Wikipedia page titles: the first letter of a page title is always upper case.
+    # keywords with characters that can't be in a page title (including '|', which separates the titles we send) are left to the search
+    titles = {}
+    for keyword in unresolved:
+        if not any(character in keyword for character in invalid_title_characters):
+            titles[keyword[0].upper() + keyword[1:]] = keyword
+    entity_ids = wikidata.get_entities_by_titles(api_url, list(titles))
+    for title, entity_id in entity_ids.items():
+        if title in titles:
+            keyword_cache[titles[title]] = entity_id
+
+    # then search for whatever's left, accepting only exact matches
+    for keyword in unresolved:
+        if keyword not in keyword_cache:
+            keyword_cache[keyword] = wikidata.search_for_exact_entity(api_url, keyword)
+
+# resolve the subjects of a batch of works using only an index (see read_index) and return a dictionary of
+# (subject type, subject code): entity ID. subjects that aren't in the index are left out of the dictionary
+def resolve_indexed_subjects(thoth_works, index):
+    subject_ids = {}
+    for subject_type, subject_code in collect_subjects(thoth_works):
+        entity_id = index.get(subject_type, {}).get(subject_code)
+        if entity_id is not None:
+            subject_ids[(subject_type, subject_code)] = entity_id
+    return subject_ids
+
+# resolve the subjects of a batch of works and return a dictionary of (subject type, subject code): entity ID
+# subjects that couldn't be resolved are left out of the dictionary
+def resolve_subjects(api_url, thoth_works):
+    subject_ids = resolve_indexed_subjects(thoth_works, read_index())
+    keyword_cache = read_cache(api_url)
+
+    keywords = set()
+    for subject_type, subject_code in collect_subjects(thoth_works):
+        if subject_type == 'KEYWORD' and (subject_type, subject_code) not in subject_ids:
+            keywords.add(subject_code)
+
+    cache_size = len(keyword_cache)
+    resolve_keywords(api_url, keywords, keyword_cache)
+    if len(keyword_cache) != cache_size:
+        write_cache(api_url, keyword_cache)
+
+    for keyword in keywords:
+        if keyword_cache.get(keyword) is not None:
+            subject_ids[('KEYWORD', keyword)] = keyword_cache[keyword]
+
+    return subject_ids
+
+# get the distinct entity IDs for a work's subjects, in the order the subjects appear in Thoth
+def get_work_subject_ids(thoth_work, subject_ids):
+    work_subject_ids = []
+    for subject in get_work_subjects(thoth_work):
+        entity_id = subject_ids.get(subject)
+        if entity_id is not None and entity_id not in work_subject_ids:
+            work_subject_ids.append(entity_id)
+    return work_subject_ids
@@ -9,15 +9,121 @@
 
 import requests
 import json
+import os
+import re
+import datetime
 from thothlibrary import ThothClient
 
-def get_thoth_works():
+# get the earliest published works from Thoth
+def get_thoth_works(limit=1):
     thoth = ThothClient(version="0.6.0")
 
-    response = thoth.works(limit=1, order='{field: PUBLICATION_DATE, direction: ASC}')
+    response = thoth.works(limit=limit, order='{field: PUBLICATION_DATE, direction: ASC}')
 
     return response
 
+# get a single work from Thoth by its work ID
+def get_thoth_work(work_id):
+    thoth = ThothClient(version="0.6.0")
+
+    response = thoth.work_by_id(work_id)
+
+    return response
+
+# raised when Thoth doesn't return a work's 'updatedAt' timestamp: without it we can't tell which works have changed
+class MissingUpdatedAtError(Exception):
+    pass
+
+# raised when the Thoth GraphQL API returns errors instead of data, e.g. a database timeout: these are usually worth retrying
+class ThothAPIError(Exception):
+    pass
+
+def get_graphql_url():
+    # get the Thoth GraphQL endpoint from OS environment variables: set in env file passed through Docker Compose
+    return os.environ.get('thoth_graphql_url') or 'https://api.thoth.pub/graphql'
+
+def get_timeout():
+    # seconds to wait for the Thoth GraphQL API before giving up: set in env file passed through Docker Compose
+    return int(os.environ.get('thoth_timeout') or 60)
+
+# turn a Thoth timestamp (e.g. '2021-01-07T16:32:40.853895Z') into a timezone-aware datetime so that timestamps can be compared
+# regardless of how many digits of fractional seconds or which UTC offset they're written with
+def parse_timestamp(timestamp):
+    match = re.match(r'^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d+)?(Z|[+-]\d\d:\d\d)?$', timestamp)
+    if not match:
+        raise ValueError('Not a Thoth timestamp: ' + timestamp)
+    fraction = (match.group(2) or '.0')[1:7].ljust(6, '0')
+    offset = match.group(3) or '+00:00'
+    if offset == 'Z':
+        offset = '+00:00'
+    return datetime.datetime.fromisoformat(match.group(1) + '.' + fraction + offset)
+
+# get the workId and 'updatedAt' of every work updated since a given timestamp, as a dictionary of workId: updatedAt
+# thothlibrary's works query doesn't ask for 'updatedAt' so we ask the GraphQL API directly for just those two fields.
+# works are requested most recently updated first so we can stop paging as soon as we reach a work that hasn't changed.
+# the API can't filter on 'updatedAt' so we page by offset, but each page overlaps the last by 'overlap' works: a work updated
+# (and so moved to the top) while we're paging shifts the rest down by one, and the overlap makes sure none of them are skipped
+def get_work_updates(since, page_size=100, overlap=20):
+    query = '{ works(limit: %d, offset: %d, order: {field: UPDATED_AT, direction: DESC}) { workId updatedAt } }'
+    since_timestamp = parse_timestamp(since) if since is not None else None
+
+    work_updates = {}
+    offset = 0
+    while True:
+        r = requests.post(get_graphql_url(), json={'query': query % (page_size, offset)}, timeout=get_timeout())
+        r.raise_for_status()
+        data = r.json()
+        if 'errors' in data or not data.get('data'):
+            raise ThothAPIError('Thoth returned errors for updatedAt query: ' + json.dumps(data.get('errors')))
+        page = data['data']['works']
+        for work in page:
+            if work.get('updatedAt') is None:
+                raise MissingUpdatedAtError('Thoth returned no updatedAt for work ' + str(work.get('workId')))
+            updated_at = parse_timestamp(work['updatedAt'])
+            if since_timestamp is not None and updated_at <= since_timestamp:
+                continue
+            if work['workId'] not in work_updates or updated_at > parse_timestamp(work_updates[work['workId']]):
+                work_updates[work['workId']] = work['updatedAt']
+        if len(page) < page_size:
+            return work_updates
+        if since_timestamp is not None and parse_timestamp(page[-1]['updatedAt']) <= since_timestamp:
+            return work_updates
+        offset += page_size - overlap
+
+# get all the works in Thoth, page by page
+def get_all_thoth_works(page_size=100):
+    thoth = ThothClient(version="0.6.0")
+
+    all_works = []
+    offset = 0
+    while True:
+        response = thoth.works(limit=page_size, offset=offset, order='{field: WORK_ID, direction: ASC}')
+        all_works.extend(response)
+        if len(response) < page_size:
+            return all_works
+        offset += page_size
+
+# get works from Thoth that have been updated since a given timestamp (an ISO 8601 string as returned in Thoth's 'updatedAt' field)
+# or every work if since is None. each work is returned with its 'updatedAt', most recently updated first
+def get_updated_thoth_works(since):
+    work_updates = get_work_updates(since)
+
+    if since is None:
+        # fetch the whole catalogue in pages rather than work by work. works created after we got the updates are left out:
+        # they're newer than any 'updatedAt' we return so they'll be picked up next time
+        works_by_id = {work['workId']: work for work in get_all_thoth_works()}
+    else:
+        works_by_id = {}
+
+    updated_works = []
+    for work_id in sorted(work_updates, key=lambda work_id: parse_timestamp(work_updates[work_id]), reverse=True):
+        work = works_by_id.get(work_id)
+        if work is None:
+            work = get_thoth_work(work_id)
+        work['updatedAt'] = work_updates[work_id]
+        updated_works.append(work)
+    return updated_works
+
 # turn a work from Thoth into a JSON string suitable for submitting to the Wikidata API
 def parse_thoth_work(work):
     label_list = [
@@ -1,10 +1,21 @@
 import requests
+import argparse
 import json
 from thothlibrary import ThothClient
 
-thoth = ThothClient()
+import snapshot
 
-response = thoth.works(limit=1, order='{field: PUBLICATION_DATE, direction: ASC}')
-#response = thoth.works()
+parser = argparse.ArgumentParser(description='Print Thoth works as JSON')
+parser.add_argument('--snapshot', action='store_true', help='read works from the local Thoth snapshot (see snapshot.py) instead of the Thoth API')
+parser.add_argument('--limit', type=int, default=1, help='number of works to print, earliest published first, whether from the Thoth API or the snapshot')
+args = parser.parse_args()
+
+if args.snapshot:
+    response = snapshot.get_snapshot_works(limit=args.limit)
+else:
+    thoth = ThothClient()
+
+    response = thoth.works(limit=args.limit, order='{field: PUBLICATION_DATE, direction: ASC}')
+    #response = thoth.works()
 
 print(json.dumps(response))
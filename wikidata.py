@@ -12,12 +12,59 @@ import requests
 import json
 import os
 import urllib
+import collections
 
 # Global variables
 resource_url = '/w/api.php'
 # Instantiate session outside of any function so that it's globally accessible.
 session = requests.Session()
 
+# a dictionary that holds at most max_size entries, dropping the least recently used entry when it's full
+class LookupCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def __setitem__(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+# Lookup caches shared by every work a process writes: a long-running process (see daemon.py) reuses these across works
+# so that repeated searches and entity creations for the same place or person don't cost another API call.
+# their size is set by wikidata_cache_size in the env file
+cache_size = int(os.environ.get('wikidata_cache_size') or 10000)
+search_cache = LookupCache(cache_size)
+entity_cache = LookupCache(cache_size)
+
+# raised when the API returns an error for a request that changes data
+class WikidataAPIError(Exception):
+    def __init__(self, code, info):
+        super().__init__(code + ': ' + info)
+        self.code = code
+
+# error codes that mean our session or CSRF token is no longer valid: logging in again fixes these
+session_error_codes = ['badtoken', 'assertuserfailed', 'assertbotfailed', 'notloggedin']
+
+def check_response(data):
+    if 'error' in data:
+        raise WikidataAPIError(data['error'].get('code', ''), data['error'].get('info', ''))
+    return data
+
 def get_url():
     endpoint_url = os.environ.get('wikidata_url')
     api_url = endpoint_url + resource_url
@@ -49,11 +96,47 @@ def get_property_values():
     )
     return property_values
 
+# get the datatype of each property (e.g. 'external-id' for 'doi') as a dictionary of property value: datatype
+# the defaults are the datatypes of these properties on wikidata.org and test.wikidata.org: a property whose datatype differs in
+# another Wikibase can be overridden in the env file with <property>_datatype, e.g. doi_datatype=string
+def get_property_datatypes():
+    default_datatypes = dict(
+        instance_of='wikibase-item',
+        edition_of='wikibase-item',
+        has_edition='wikibase-item',
+        title='monolingualtext',
+        subtitle='string',
+        author='wikibase-item',
+        editor='wikibase-item',
+        translator='wikibase-item',
+        contributor='wikibase-item',
+        main_subject='wikibase-item',
+        publication_date='time',
+        publisher='string',
+        publication_place='wikibase-item',
+        page_count='quantity',
+        copyright_license='wikibase-item',
+        copyright_status='wikibase-item',
+        doi='external-id',
+        isbn_13='external-id',
+        lccn='external-id',
+        url='url'
+    )
+    property_datatypes = {}
+    for name, property_value in get_property_values().items():
+        if property_value is not None:
+            property_datatypes[property_value] = os.environ.get(name + '_datatype') or default_datatypes[name]
+    return property_datatypes
+
 # get Wikidata entities such as 'written work' or CC licenses
 def get_constant_entities():
     wikidata_constants = dict(
         written_work=os.environ.get('written_work'),
-        version=os.environ.get('version')
+        version=os.environ.get('version'),
+        # Creative Commons Attribution 4.0 International on wikidata.org
+        cc_by_license=os.environ.get('cc_by_license') or 'Q208934',
+        # Wikimedia disambiguation page: Q4167410 on wikidata.org. keywords are never resolved to disambiguation pages
+        disambiguation_page=os.environ.get('disambiguation_page')
     )
     return wikidata_constants
 
@@ -105,12 +188,116 @@ def authenticate():
 # search for an entity and return the first Q id that returns
 # NB: this feels very imprecise. there's got to be a better way to do this.
 def search_for_entity(api_url, query_string):
+    if query_string in search_cache:
+        return search_cache[query_string]
     uri = api_url + '?action=wbsearchentities&format=json&search=' + urllib.parse.quote(query_string) + '&language=en&type=item&limit=1'
     r = session.get(uri)
     data = r.json()
+    entity_id = None
     if not len(data['search']) == 0:
         entity_id = data['search'][0]['id']
-        return entity_id
+    search_cache[query_string] = entity_id
+    return entity_id
+
+# whether a query string is exactly one of an entity's names, ignoring case and extra spaces
+def matches_exactly(query_string, names):
+    query = ' '.join(query_string.split()).lower()
+    return query in [' '.join(name.split()).lower() for name in names]
+
+# an entity's English label and aliases, as returned by wbgetentities
+def get_entity_names(entity):
+    names = []
+    if 'en' in entity.get('labels', {}):
+        names.append(entity['labels']['en']['value'])
+    for alias in entity.get('aliases', {}).get('en', []):
+        names.append(alias['value'])
+    return names
+
+# whether an entity, as returned by wbgetentities, is a Wikimedia disambiguation page: an instance of the disambiguation_page
+# constant or, if that isn't set, described as one in English
+def is_disambiguation_page(entity):
+    instance_of = get_property_values()['instance_of']
+    disambiguation_page = get_constant_entities()['disambiguation_page']
+    if disambiguation_page is not None:
+        for claim in entity.get('claims', {}).get(instance_of, []):
+            try:
+                if claim['mainsnak']['datavalue']['value']['id'] == disambiguation_page:
+                    return True
+            except KeyError:
+                pass
+    description = entity.get('descriptions', {}).get('en', {}).get('value', '')
+    return description == 'Wikimedia disambiguation page'
+
+# get the entities (with English labels, aliases, and descriptions, and their claims) for a list of Q ids or, with a site, a list of
+# page titles on that site. requests are sent 50 at a time (the most wbgetentities accepts) so a long list costs only a few requests
+def get_entities(api_url, entity_ids=None, titles=None, site='enwiki'):
+    keys = entity_ids if entity_ids is not None else titles
+    entities = []
+    for i in range(0, len(keys), 50):
+        parameters = dict(
+            action='wbgetentities',
+            format='json',
+            props='sitelinks|labels|aliases|descriptions|claims',
+            languages='en'
+        )
+        if entity_ids is not None:
+            parameters['ids'] = '|'.join(keys[i:i + 50])
+        else:
+            parameters['sites'] = site
+            parameters['titles'] = '|'.join(keys[i:i + 50])
+        r = session.get(url=api_url, params=parameters)
+        data = r.json()
+        for entity in data.get('entities', {}).values():
+            if 'missing' not in entity:
+                entities.append(entity)
+    return entities
+
+# search for an entity whose English label or alias is exactly the query string (ignoring case and extra spaces) and return its Q id
+# unlike search_for_entity, a near match isn't good enough, and nor is a disambiguation page: if nothing fits, None is returned
+def search_for_exact_entity(api_url, query_string):
+    cache_key = ('exact', query_string)
+    if cache_key in search_cache:
+        return search_cache[cache_key]
+    parameters = dict(
+        action='wbsearchentities',
+        format='json',
+        search=query_string,
+        language='en',
+        type='item',
+        limit=10
+    )
+    r = session.get(url=api_url, params=parameters)
+    data = r.json()
+    candidate_ids = []
+    for result in data.get('search', []):
+        names = [result.get('label', '')] + result.get('aliases', [])
+        if result.get('match', {}).get('type') in ['label', 'alias']:
+            names.append(result['match'].get('text', ''))
+        if matches_exactly(query_string, names):
+            candidate_ids.append(result['id'])
+    # search results don't say what an entity is an instance of, so check the candidates for disambiguation pages in one request
+    entity_id = None
+    if candidate_ids:
+        entities = {entity['id']: entity for entity in get_entities(api_url, entity_ids=candidate_ids)}
+        for candidate_id in candidate_ids:
+            if candidate_id in entities and not is_disambiguation_page(entities[candidate_id]):
+                entity_id = candidate_id
+                break
+    search_cache[cache_key] = entity_id
+    return entity_id
+
+# look up the entity IDs for a list of Wikipedia page titles, e.g. ['Open access', 'Philosophy'], and return a dictionary of title: Q id
+# a title is only matched to an entity whose English label or alias is exactly the title and which isn't a disambiguation page:
+# titles that don't match a page, redirect to another page, or fail those checks are left out of the dictionary
+def get_entities_by_titles(api_url, titles, site='enwiki'):
+    entity_ids = {}
+    for entity in get_entities(api_url, titles=titles, site=site):
+        sitelink = entity.get('sitelinks', {}).get(site)
+        if sitelink is None or sitelink['title'] not in titles:
+            continue
+        if matches_exactly(sitelink['title'], get_entity_names(entity)) and not is_disambiguation_page(entity):
+            entity_ids[sitelink['title']] = entity['id']
+    return entity_ids
 
 def read_entity(api_url, entity_id):
     uri = api_url + '?action=wbgetclaims&format=json&entity=' + entity_id
@@ -120,22 +307,38 @@ def read_entity(api_url, entity_id):
     return claims
 
 def create_entity(api_url, edit_token, data_string):
+    # creating an entity with the same label and description twice returns an error containing the existing entity ID,
+    # so an entity ID we've already been given can be reused without another call to the API
+    if data_string in entity_cache:
+        return entity_cache[data_string]
     parameters = {
         'action': 'wbeditentity',
         'format': 'json',
         'new': 'item',
         'token': edit_token,
+        'assert': 'user',  # fail rather than edit anonymously if our login has expired
         # note: the data value is a string. I think it will get URL encoded by requests before posting
         'data': data_string
     }
     r = session.post(api_url, data=parameters)
     response = r.text
     if response[2:7] == 'error':
+        # an error pointing at an existing entity with the same label and description is expected and handled by the caller:
+        # any other error (e.g. a bad token) is raised
+        if '[[Q' not in response:
+            check_response(r.json())
+        entity_cache[data_string] = response
         return response
     else:
         data = r.json()
+        entity_cache[data_string] = data["entity"]["id"]
         return data["entity"]["id"]
 
+# empty the lookup caches so that entities deleted or merged on Wikidata since they were cached are looked up again
+def clear_caches():
+    search_cache.clear()
+    entity_cache.clear()
+
 # function for writing statements linking to existing Q items in Wikidata
 # pass in the local names including the initial letter as strings, e.g. ('Q3345', 'P6', 'Q1917')
 def write_statement_item(api_url, edit_token, subjectQNumber, propertyPNumber, objectQNumber):
@@ -147,12 +350,13 @@ def write_statement_item(api_url, edit_token, subjectQNumber, propertyPNumber, o
         'snaktype':'value',
         'bot':'1',  # not sure that this actually does anything
         'token': edit_token,
+        'assert':'user',  # fail rather than edit anonymously if our login has expired
         'property': propertyPNumber,
         # note: the value is a string, not an actual data structure.  I think it will get URL encoded by requests before posting
         'value':'{"entity-type":"item","numeric-id":' + strippedQNumber+ '}'
     }
     r = session.post(api_url, data=parameters)
-    data = r.json()
+    data = check_response(r.json())
     return data
 
 # function for writing statements where the value is a string
@@ -165,11 +369,12 @@ def write_statement_string(api_url, edit_token, subjectQNumber, propertyPNumber,
         'snaktype':'value',
         'bot':'1',  # not sure that this actually does anything
         'token': edit_token,
+        'assert':'user',  # fail rather than edit anonymously if our login has expired
         'property': propertyPNumber,
         'value': '"' + string + '"'
     }
     r = session.post(api_url, data=parameters)
-    data = r.json()
+    data = check_response(r.json())
     return data
 
 # function for writing statements where the value is a json string
@@ -182,13 +387,26 @@ def write_statement_json(api_url, edit_token, subjectQNumber, propertyPNumber, s
         'snaktype':'value',
         'bot':'1',  # not sure that this actually does anything
         'token': edit_token,
+        'assert':'user',  # fail rather than edit anonymously if our login has expired
         'property': propertyPNumber,
         'value': string
     }
     r = session.post(api_url, data=parameters)
-    data = r.json()
+    data = check_response(r.json())
     return data
 
+# function for writing a statement from a (property, value type, value) tuple as built by work.get_work_statements and
+# editions.get_edition_statements. value types are Wikibase datavalue types: 'wikibase-entityid' values are Q ids, 'string'
+# values are strings, and other values ('monolingualtext', 'time', 'quantity') are dictionaries
+def write_statement(api_url, edit_token, subjectQNumber, statement):
+    propertyPNumber, value_type, value = statement
+    if value_type == 'wikibase-entityid':
+        return write_statement_item(api_url, edit_token, subjectQNumber, propertyPNumber, value)
+    elif value_type == 'string':
+        return write_statement_string(api_url, edit_token, subjectQNumber, propertyPNumber, value)
+    else:
+        return write_statement_json(api_url, edit_token, subjectQNumber, propertyPNumber, json.dumps(value))
+
 # testing deletion function: unclear to me whether Wikidata entities can be deleted through the API or not
 def delete_entity(api_url, edit_token, entity_id):
     parameters = dict(
@@ -198,5 +416,5 @@ def delete_entity(api_url, edit_token, entity_id):
         reason='Testing purposes'
     )
     r = session.post(api_url, data=parameters)
-    data = r.json()
+    data = check_response(r.json())
     return data
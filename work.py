@@ -9,6 +9,8 @@
 
 import thoth
 import wikidata
+import subjects
+import contributors
 import json
 import re
 
@@ -27,94 +29,77 @@ def create_work(api_url, CSRF_token, thoth_work):
 
     return entity_id
 
-def write_work_statements(api_url, CSRF_token, thoth_work, work_id):
+# build the statements for a work as a list of (property, value type, value) tuples: see wikidata.write_statement
+# person_ids is a dictionary of contributors' entity IDs from contributors.create_people and subject_ids is a dictionary of
+# resolved subjects from subjects.resolve_subjects. the statements don't depend on Wikidata so they can also be exported (see exporter.py)
+def get_work_statements(thoth_work, person_ids, subject_ids):
 
-    # insert statements for the work's various properties
     # first, get the Wikidata property values: these differ between test.wikidata.org and wikidata.org so are set in the config file passed through Docker Compose
     property_values = wikidata.get_property_values()
 
     # get Wikidata constants such as 'written work'
     wikidata_constants = wikidata.get_constant_entities()
 
+    statements = []
+
+    # statement for 'instance of written work'
+    statements.append((property_values['instance_of'], 'wikibase-entityid', wikidata_constants['written_work']))
+
+    # statement for 'title'
+    title_dict = dict(
+        text=thoth_work['title'],
+        language='en'
+    )
+    statements.append((property_values['title'], 'monolingualtext', title_dict))
+
+    # statement for 'subtitle'
+    if thoth_work['subtitle'] is not None:
+        statements.append((property_values['subtitle'], 'string', thoth_work['subtitle']))
+
+    # statements for 'author', 'editor', or 'contributor'
+    for contributor in thoth_work['contributions']:
+        prop = contributors.get_contributor_property(contributor, property_values, ['AUTHOR', 'EDITOR'])
+        statements.append((prop, 'wikibase-entityid', person_ids[contributors.get_person_key(contributor)]))
+
+    # statements for 'main subject'
+    for subject_id in subjects.get_work_subject_ids(thoth_work, subject_ids):
+        statements.append((property_values['main_subject'], 'wikibase-entityid', subject_id))
+
+    return statements
+
+# subject_ids is a dictionary of resolved subjects from subjects.resolve_subjects: pass it in when writing a batch of works
+# so that subjects shared between works are only resolved once. if it isn't passed in, this work's subjects are resolved on their own
+def write_work_statements(api_url, CSRF_token, thoth_work, work_id, subject_ids=None):
+
+    # insert statements for the work's various properties
+    property_values = wikidata.get_property_values()
+
+    # create entities for the work's contributors
+    person_ids = contributors.create_people(api_url, CSRF_token, thoth_work)
+
+    if subject_ids is None:
+        subject_ids = subjects.resolve_subjects(api_url, [thoth_work])
+
     # check for existing claims on that work. we'll use this to check whether claim statements already exist for that entity or not.
     existing_claims = wikidata.read_entity(api_url, work_id)
 
+    # a work can have many main subjects so rather than skipping the property if it exists, skip only the subjects already there
+    existing_subjects = []
+    for claim in existing_claims.get(property_values['main_subject'], []):
+        try:
+            existing_subjects.append(claim['mainsnak']['datavalue']['value']['id'])
+        except KeyError:
+            pass
+
     sub = work_id # subject entity
 
-    # insert statement for 'instance of written work'
-    if property_values['instance_of'] not in existing_claims:
-        prop = property_values['instance_of'] # property
-        obj = wikidata_constants['written_work'] # object entity
-        instance_of_response = wikidata.write_statement_item(api_url, CSRF_token, sub, prop, obj)
-
-    # insert statement for 'title'
-    if property_values['title'] not in existing_claims:
-        prop = property_values['title'] # property
-        title_dict = dict(
-            text=thoth_work['title'],
-            language='en'
-        )
-        string = json.dumps(title_dict)
-        title_response = wikidata.write_statement_json(api_url, CSRF_token, sub, prop, string)
-
-    # insert statement for 'subtitle'
-    if thoth_work['subtitle'] is not None:
-        if property_values['subtitle'] not in existing_claims:
-            # insert statement for 'subtitle'
-            prop = property_values['subtitle'] # property
-            string = thoth_work['subtitle']
-            subtitle_response = wikidata.write_statement_string(api_url, CSRF_token, sub, prop, string)
-    else:
-        subtitle_response = 'No subtitle'
-
-    # insert statement for 'author', 'editor', 'translator', or 'contributor'
-    for contributor in thoth_work['contributions']:
-        if contributor['contributionType'] == 'AUTHOR':
-            parsed_person = thoth.parse_person(contributor)
-            # create entity for the person
-            person_id = wikidata.create_entity(api_url, CSRF_token, parsed_person)
-            # If there's already an entity object with that label and description, return the entity ID of that existing object
-            if person_id[2:7] == 'error':
-                data = json.loads(person_id)
-                entity_id_search = re.search("\[\[(Q.*)\|", data["error"]["info"])
-                if entity_id_search:
-                    person_id = entity_id_search.group(1)
-            if property_values['author'] not in existing_claims:
-                prop = property_values['author']
-                obj = person_id
-                author_response = wikidata.write_statement_item(api_url, CSRF_token, sub, prop, obj)
-        elif contributor['contributionType'] == 'EDITOR':
-            parsed_person = thoth.parse_person(contributor)
-            # create entity for the person
-            person_id = wikidata.create_entity(api_url, CSRF_token, parsed_person)
-            # If there's already an entity object with that label and description, return the entity ID of that existing object
-            if person_id[2:7] == 'error':
-                data = json.loads(person_id)
-                entity_id_search = re.search("\[\[(Q.*)\|", data["error"]["info"])
-                if entity_id_search:
-                    person_id = entity_id_search.group(1)
-            if property_values['editor'] not in existing_claims:
-                prop = property_values['editor']
-                obj = person_id
-                editor_response = wikidata.write_statement_item(api_url, CSRF_token, sub, prop, obj)
-        else:
-            parsed_person = thoth.parse_person(contributor)
-            # create entity for the person
-            person_id = wikidata.create_entity(api_url, CSRF_token, parsed_person)
-            # If there's already an entity object with that label and description, return the entity ID of that existing object
-            if person_id[2:7] == 'error':
-                data = json.loads(person_id)
-                entity_id_search = re.search("\[\[(Q.*)\|", data["error"]["info"])
-                if entity_id_search:
-                    person_id = entity_id_search.group(1)
-            if property_values['contributor'] not in existing_claims:
-                prop = property_values['contributor']
-                obj = person_id
-                contributor_response = wikidata.write_statement_item(api_url, CSRF_token, sub, prop, obj)
-
-    # insert statement for 'main subject'
-    for subject in thoth_work['subjects']:
-        if subject['subjectType'] == 'KEYWORD' and subject['subjectOrdinal'] == 1:
-            print(subject['subjectCode'])
+    for statement in get_work_statements(thoth_work, person_ids, subject_ids):
+        prop, value_type, value = statement
+        if prop == property_values['main_subject']:
+            if value in existing_subjects:
+                continue
+        elif prop in existing_claims:
+            continue
+        statement_response = wikidata.write_statement(api_url, CSRF_token, sub, statement)
 
     return work_id